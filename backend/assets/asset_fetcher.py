@@ -5,16 +5,154 @@ import os
 # from dotenv import load_dotenv
 # load_dotenv()  # noqa
 
-import requests
 import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache
 from datetime import datetime
 import httpx
-from sqlalchemy.orm import Session
-from typing import List, Dict
+import msgspec
+from typing import List, Dict, Optional, Tuple
 from sqlalchemy import text
 
-from database.database import AsyncSessionLocal, SessionLocal
-from database.models import Asset, AssetType
+from database.database import AsyncSessionLocal, get_driver_connection
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson parses the raw response bytes directly and is considerably faster on the multi-MB listings
+_loads = orjson.loads if orjson else json.loads
+
+
+class AssetRow(msgspec.Struct):
+    """Entry of the /stocks and /etfs listings; fields we don't store are skipped while decoding"""
+    symbol: Optional[str] = None
+    mic_code: Optional[str] = None
+    exchange: Optional[str] = None
+    currency: Optional[str] = None
+    name: Optional[str] = None
+    country: Optional[str] = None
+
+
+class CryptoRow(msgspec.Struct):
+    """Entry of the /cryptocurrencies listing"""
+    symbol: Optional[str] = None
+    available_exchanges: Optional[List[str]] = None
+    currency_base: Optional[str] = None
+    currency_quote: Optional[str] = None
+
+
+class _AssetsListResponse(msgspec.Struct):
+    data: Optional[List[AssetRow]] = None
+
+
+class _CryptoListResponse(msgspec.Struct):
+    data: Optional[List[CryptoRow]] = None
+
+
+# Column order of the records COPY'd into assets_list
+_ASSET_COLUMNS = ["symbol", "mic_code", "exchange",
+                  "currency", "name", "country", "updated_at"]
+_CRYPTO_COLUMNS = ["symbol", "available_exchanges", "currency_base",
+                   "currency_quote", "updated_at"]
+
+# How long a background caller waits before re-checking a slot left to a priority caller
+_PRIORITY_RETRY = 0.1
+
+# Daily candles of a fixed date range don't change within a day - repeated backfills of the same
+# asset and purchase date are served from memory. Intraday ranges end at "now" and never repeat
+_DAILY_PRICES_CACHE_SIZE = 1024
+_DAILY_PRICES_TTL = 24 * 60 * 60
+
+# Listing refresh statements, built once at import instead of on every scheduled run
+_CREATE_ASSETS_STAGING_SQL = "CREATE TEMP TABLE assets_list_staging (LIKE assets_list) ON COMMIT DROP"
+_CREATE_CRYPTO_STAGING_SQL = "CREATE TEMP TABLE crypto_list_staging (LIKE crypto_list) ON COMMIT DROP"
+
+_ASSETS_MERGE_SQL = """
+    INSERT INTO assets_list (symbol, mic_code, exchange, name, country, currency, updated_at)
+    SELECT DISTINCT ON (symbol, mic_code)
+        symbol, mic_code, exchange, name, country, currency, updated_at
+    FROM assets_list_staging
+    ON CONFLICT (symbol, mic_code) DO UPDATE SET
+        exchange = EXCLUDED.exchange,
+        name = EXCLUDED.name,
+        country = EXCLUDED.country,
+        currency = EXCLUDED.currency,
+        updated_at = EXCLUDED.updated_at
+    WHERE (assets_list.exchange, assets_list.name, assets_list.country, assets_list.currency)
+        IS DISTINCT FROM (EXCLUDED.exchange, EXCLUDED.name, EXCLUDED.country, EXCLUDED.currency)
+"""
+
+# Sweep delisted assets - rows no longer present in the fresh listing
+_ASSETS_SWEEP_SQL = """
+    DELETE FROM assets_list a
+    WHERE NOT EXISTS (
+        SELECT 1 FROM assets_list_staging s
+        WHERE s.symbol = a.symbol AND s.mic_code = a.mic_code
+    )
+"""
+
+_CRYPTO_MERGE_SQL = """
+    INSERT INTO crypto_list (symbol, available_exchanges, currency_base, currency_quote, updated_at)
+    SELECT DISTINCT ON (symbol)
+        symbol, available_exchanges, currency_base, currency_quote, updated_at
+    FROM crypto_list_staging
+    ON CONFLICT (symbol) DO UPDATE SET
+        available_exchanges = EXCLUDED.available_exchanges,
+        currency_base = EXCLUDED.currency_base,
+        currency_quote = EXCLUDED.currency_quote,
+        updated_at = EXCLUDED.updated_at
+    WHERE (crypto_list.available_exchanges, crypto_list.currency_base, crypto_list.currency_quote)
+        IS DISTINCT FROM (EXCLUDED.available_exchanges, EXCLUDED.currency_base, EXCLUDED.currency_quote)
+"""
+
+_CRYPTO_SWEEP_SQL = """
+    DELETE FROM crypto_list c
+    WHERE NOT EXISTS (
+        SELECT 1 FROM crypto_list_staging s WHERE s.symbol = c.symbol
+    )
+"""
+
+
+class RateLimiter():
+    """
+    Sliding-window limiter allowing at most `calls` acquisitions in any `period` seconds.
+
+    Priority acquisitions (user requests waiting on a response) take the next free slot ahead of
+    background jobs. Nothing is held while waiting, so a waiting caller never blocks the others.
+    """
+
+    def __init__(self, calls: int, period: float):
+        self.calls = calls
+        self.period = period
+        self._timestamps = deque()
+        self._priority_waiters = 0
+
+    async def acquire(self, priority: bool = False) -> None:
+        """Wait until another call fits into the window, then record it"""
+        if priority:
+            self._priority_waiters += 1
+        try:
+            while True:
+                # No await between the check and the append, so the event loop can't interleave them
+                now = time.monotonic()
+                while self._timestamps and now - self._timestamps[0] >= self.period:
+                    self._timestamps.popleft()
+
+                full = len(self._timestamps) >= self.calls
+                if not full and (priority or not self._priority_waiters):
+                    self._timestamps.append(now)
+                    return
+
+                # Sleep until the oldest call leaves the window; a free slot reserved for a
+                # priority caller is re-checked shortly
+                await asyncio.sleep(self.period - (now - self._timestamps[0]) if full else _PRIORITY_RETRY)
+        finally:
+            if priority:
+                self._priority_waiters -= 1
 
 
 class TwelveDataProvider():
@@ -23,55 +161,75 @@ class TwelveDataProvider():
     def __init__(self):
         self.api_key = os.getenv("TWELVE_DATA_API_KEY", None)
         self.base_url = "https://api.twelvedata.com"
+        # One long-lived client keeps TCP/TLS sessions alive and multiplexes requests over HTTP/2
+        self._client = httpx.AsyncClient(
+            http2=True,
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=32,
+                                max_connections=64,
+                                keepalive_expiry=60)
+        )
+        self.rate_limiter = RateLimiter(calls=8, period=60)
+        # (symbol, mic_code, exchange, start_date, end_date) -> (expires_at, result), daily interval only
+        self._daily_prices_cache: "OrderedDict[Tuple, Tuple[float, Tuple[Optional[str], List[Dict]]]]" = OrderedDict()
+
+    async def aclose(self) -> None:
+        """Close the underlying HTTP client"""
+        await self._client.aclose()
+
+    async def _get_streamed_json(self, url: str, response_type: type, **kwargs):
+        """
+        GET a large JSON payload, collecting the body into one buffer that msgspec
+        decodes and validates against response_type in a single pass
+        """
+        buffer = bytearray()
+        async with self._client.stream("GET", url, **kwargs) as response:
+            async for chunk in response.aiter_bytes():
+                buffer.extend(chunk)
 
-    async def get_assets_list(self) -> List[Dict]:
-        """Fetch list of all available assets from TwelveData"""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            stocks_response = await client.get(f"{self.base_url}/stocks")
-            etfs_response = await client.get(f"{self.base_url}/etfs")
-
-            stocks_data = stocks_response.json()
-            etfs_data = etfs_response.json()
-
-            data = []
-
-            if "data" in stocks_data:
-                data.extend(stocks_data["data"])
-            if "data" in etfs_data:
-                data.extend(etfs_data["data"])
-
-            if data:
-                return data
+        return msgspec.json.decode(buffer, type=response_type)
 
+    async def get_assets_list(self) -> List[AssetRow]:
+        """Fetch list of all available assets from TwelveData"""
+        stocks_data, etfs_data = await asyncio.gather(
+            self._get_streamed_json(
+                f"{self.base_url}/stocks", _AssetsListResponse),
+            self._get_streamed_json(
+                f"{self.base_url}/etfs", _AssetsListResponse)
+        )
+
+        # The listing replaces assets_list and sweeps what is missing from it, so a partial
+        # listing (stocks without ETFs or the other way round) is a failure, not a result
+        if stocks_data.data is None or etfs_data.data is None:
             raise ValueError("Could not fetch assets list")
 
-    async def get_crypto_list(self) -> List[Dict]:
-        """Fetch list of all available cryptocurrencies from TwelveData"""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            crypto_response = await client.get(f"{self.base_url}/cryptocurrencies")
+        return stocks_data.data + etfs_data.data
 
-            crypto_data = crypto_response.json()
+    async def get_crypto_list(self) -> List[CryptoRow]:
+        """Fetch list of all available cryptocurrencies from TwelveData"""
+        crypto_data = await self._get_streamed_json(
+            f"{self.base_url}/cryptocurrencies", _CryptoListResponse)
 
-            if "data" in crypto_data:
-                return crypto_data["data"]
+        if crypto_data.data is not None:
+            return crypto_data.data
 
-            raise ValueError("Could not fetch cryptocurrencies list")
+        raise ValueError("Could not fetch cryptocurrencies list")
 
     async def get_currency_exchange_rates(self) -> List[Dict]:
         """Fetch list of currency exchange rates from TwelveData"""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            symbols = ["USD/EUR", "EUR/USD", "USD/GBP",
-                       "GBP/USD", "USD/PLN", "PLN/USD"]
-            currency_data = []
+        symbols = ["USD/EUR", "EUR/USD", "USD/GBP",
+                   "GBP/USD", "USD/PLN", "PLN/USD"]
 
-            for symbol in symbols:
-                currency_response = await client.get(f"{self.base_url}/exchange_rate", params={
-                    "apikey": self.api_key,
-                    "symbol": symbol
-                })
-                currency_data.append(currency_response.json())
+        # Requests are independent, so issue them concurrently
+        currency_responses = await asyncio.gather(*[
+            self._client.get(f"{self.base_url}/exchange_rate", params={
+                "apikey": self.api_key,
+                "symbol": symbol
+            })
+            for symbol in symbols
+        ])
 
-            return currency_data
+        return [_loads(response.content) for response in currency_responses]
 
     async def get_historical_prices(
         self,
@@ -81,14 +239,15 @@ class TwelveDataProvider():
         interval: str = "1day",  # 1min, 5min, 15min, 30min, 1h, 1day, 1week, 1month
         start_date: str = None,  # Format: "2024-01-01" or "2024-01-01 09:30:00"
         end_date: str = None
-    ) -> List[Dict]:
+    ) -> Tuple[Optional[str], List[Dict]]:
         """
         Get historical OHLCV data.
 
         When start_date and end_date are provided, the API returns all data points
         within that range - no need for outputsize parameter.
 
-        Returns: [
+        Returns the quote currency from the response meta alongside the candles:
+        ("USD", [
             {
                 "datetime": "2024-01-15",
                 "open": "150.00",
@@ -98,35 +257,125 @@ class TwelveDataProvider():
                 "volume": "1000000"
             },
             ...
-        ]
+        ])
+        """
+        cache_key = (symbol, mic_code, exchange, start_date, end_date)
+        if interval == "1day":
+            cached = self._daily_prices_cache.get(cache_key)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+
+        # Only user-facing backfills call this - they go ahead of the scheduled batch jobs
+        await self.rate_limiter.acquire(priority=True)
+
+        params = {
+            "symbol": symbol,
+            "mic_code": mic_code,
+            "exchange": exchange,
+            "interval": interval,
+            "apikey": self.api_key,
+            "format": "JSON"
+        }
+
+        if start_date:
+            params["start_date"] = start_date
+        if end_date:
+            params["end_date"] = end_date
+
+        response = await self._client.get(f"{self.base_url}/time_series", params=params)
+        data = _loads(response.content)
+
+        if "values" in data:
+            result = data["meta"].get("currency", None), data["values"]
+            if interval == "1day":
+                self._daily_prices_cache[cache_key] = (
+                    time.monotonic() + _DAILY_PRICES_TTL, result)
+                if len(self._daily_prices_cache) > _DAILY_PRICES_CACHE_SIZE:
+                    self._daily_prices_cache.popitem(last=False)
+            return result
+
+        raise ValueError(
+            f"Could not fetch historical prices for {symbol}: {data}")
+
+    async def get_historical_prices_batch(
+        self,
+        symbols: List[str],
+        mic_code: str,
+        exchange: str = None,
+        interval: str = "1day",
+        start_date: str = None,
+        end_date: str = None,
+        priority: bool = False
+    ) -> Dict[str, object]:
         """
+        Get historical OHLCV data for several symbols of one exchange in a single request.
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            params = {
-                "symbol": symbol,
-                "mic_code": mic_code,
-                "exchange": exchange,
-                "interval": interval,
-                "apikey": self.api_key,
-                "format": "JSON"
-            }
+        The API bills one credit per symbol, so the rate limiter is charged for each of them.
+        With priority, the credits are taken ahead of background callers (user requests).
+        Returns {symbol: (currency, values)} like get_historical_prices, or {symbol: ValueError}
+        for symbols the API could not serve.
+        """
+        for _ in symbols:
+            await self.rate_limiter.acquire(priority)
+
+        params = {
+            "symbol": ",".join(symbols),
+            "mic_code": mic_code,
+            "exchange": exchange,
+            "interval": interval,
+            "apikey": self.api_key,
+            "format": "JSON"
+        }
+
+        if start_date:
+            params["start_date"] = start_date
+        if end_date:
+            params["end_date"] = end_date
+
+        response = await self._client.get(f"{self.base_url}/time_series", params=params)
+        data = _loads(response.content)
+
+        # A single symbol comes back unwrapped, several are keyed by symbol
+        if len(symbols) == 1:
+            data = {symbols[0]: data}
 
-            if start_date:
-                params["start_date"] = start_date
-            if end_date:
-                params["end_date"] = end_date
+        results = {}
+        for symbol in symbols:
+            symbol_data = data.get(symbol) if isinstance(data, dict) else None
+            if symbol_data and "values" in symbol_data:
+                results[symbol] = (symbol_data["meta"].get(
+                    "currency", None), symbol_data["values"])
+            else:
+                results[symbol] = ValueError(
+                    f"Could not fetch historical prices for {symbol}: {symbol_data or data}")
 
-            response = await client.get(f"{self.base_url}/time_series", params=params)
-            data = response.json()
+        return results
 
-            if "values" in data:
-                for item in data["values"]:
-                    item["currency"] = data["meta"].get("currency", None)
-                data["values"]
-                return data["values"]
 
-            raise ValueError(
-                f"Could not fetch historical prices for {symbol}: {data}")
+def _asset_records(assets: List[AssetRow], updated_at: datetime):
+    """Yield assets_list records in _ASSET_COLUMNS order, skipping assets without symbol or MIC code"""
+    for asset in assets:
+        if not asset.symbol or not asset.mic_code:
+            continue
+
+        yield (asset.symbol, asset.mic_code, asset.exchange, asset.currency,
+               asset.name, asset.country, updated_at)
+
+
+def _crypto_records(cryptos: List[CryptoRow], updated_at: datetime):
+    """Yield crypto_list records in _CRYPTO_COLUMNS order, skipping cryptos without symbol or exchanges"""
+    for crypto in cryptos:
+        if not crypto.symbol or not crypto.available_exchanges:
+            continue
+
+        yield (crypto.symbol, crypto.available_exchanges, crypto.currency_base,
+               crypto.currency_quote, updated_at)
+
+
+@lru_cache(maxsize=1)
+def get_provider() -> TwelveDataProvider:
+    """Shared provider, so scheduled jobs reuse one HTTP client and rate limiter"""
+    return TwelveDataProvider()
 
 
 async def update_assets_list():
@@ -143,54 +392,48 @@ async def update_assets_list():
     """
     print(f"[{datetime.utcnow()}] Updating asset list...")
 
-    provider = TwelveDataProvider()
+    provider = get_provider()
 
     try:
-        # Fetch assets from API
+        # Fetch before checking out a connection - the listing download takes a while
         assets = await provider.get_assets_list()
 
-        # Async database operations
         async with AsyncSessionLocal() as db:
             try:
-                # Delete existing assets
-                await db.execute(text("DELETE FROM assets_list"))
-
-                # Prepare batch insert
-                valid_assets = []
-                for asset in assets:
-                    # Skip assets without required fields
-                    if not asset.get('symbol') or not asset.get('mic_code'):
-                        continue
-
-                    valid_assets.append({
-                        "symbol": asset["symbol"],
-                        "mic_code": asset["mic_code"],
-                        "exchange": asset["exchange"],
-                        "currency": asset.get("currency"),
-                        "name": asset["name"],
-                        "country": asset.get("country"),
-                        "currency": asset.get("currency"),
-                        "updated_at": datetime.utcnow()
-                    })
-
-                # Batch insert with composite primary key (symbol, mic_code)
-                if valid_assets:
-                    await db.execute(
-                        text("""
-                            INSERT INTO assets_list (symbol, mic_code, exchange, name, country, currency, updated_at)
-                            VALUES (:symbol, :mic_code, :exchange, :name, :country, :currency, :updated_at)
-                            ON CONFLICT (symbol, mic_code) DO UPDATE SET
-                                exchange = EXCLUDED.exchange,
-                                name = EXCLUDED.name,
-                                country = EXCLUDED.country,
-                                currency = EXCLUDED.currency,
-                                updated_at = EXCLUDED.updated_at
-                        """),
-                        valid_assets
-                    )
+                # Filter and project rows lazily so COPY streams them without
+                # materializing a second copy of the listing
+                records = _asset_records(assets, datetime.utcnow())
+
+                # Bulk load with COPY into a staging table, then upsert on the composite
+                # primary key (symbol, mic_code) and sweep delisted pairs. Unlike TRUNCATE this
+                # takes no ACCESS EXCLUSIVE lock that would block asset searches, and unchanged
+                # rows are not rewritten. The staging table is created through the session so
+                # the driver connection joins its transaction
+                await db.execute(text(_CREATE_ASSETS_STAGING_SQL))
+                conn = await get_driver_connection(db)
+                copied = await conn.copy_records_to_table(
+                    "assets_list_staging",
+                    records=records,
+                    columns=_ASSET_COLUMNS
+                )
+
+                # An empty listing is treated as a failed fetch, not a wipe. The COPY
+                # command tag ("COPY 1234") counts the streamed records
+                if copied.split()[-1] == "0":
+                    print("⚠️ Assets list came back empty, keeping the current one")
+                    await db.rollback()
+                    return
+
+                # Merge on the driver connection too - no SQLAlchemy text() parsing or
+                # bind-param processing. Without arguments asyncpg sends it over the simple
+                # query protocol (no prepare), which suits a statement run once per refresh
+                status = await conn.execute(_ASSETS_MERGE_SQL)
+                swept = await conn.execute(_ASSETS_SWEEP_SQL)
 
                 await db.commit()
-                print(f"✅ Successfully updated {len(valid_assets)} assets")
+                # asyncpg returns the command tags, e.g. "INSERT 0 1234" / "DELETE 12"
+                print(
+                    f"✅ Successfully updated {status.split()[-1]} assets, removed {swept.split()[-1]} delisted")
 
             except Exception as e:
                 print(f"❌ Error updating assets in DB: {e}")
@@ -211,51 +454,40 @@ async def update_crypto_list():
     """
     print(f"[{datetime.utcnow()}] Updating cryptocurrency list...")
 
-    provider = TwelveDataProvider()
+    provider = get_provider()
 
     try:
-        # Fetch cryptocurrencies from API
+        # Fetch before checking out a connection - the listing download takes a while
         cryptos = await provider.get_crypto_list()
 
-        # Async database operations
         async with AsyncSessionLocal() as db:
             try:
-                # Delete existing cryptocurrencies
-                await db.execute(text("DELETE FROM crypto_list"))
-
-                # Prepare batch insert
-                valid_cryptos = []
-                for crypto in cryptos:
-                    # Skip cryptos without required fields
-                    if not crypto.get('symbol') or not crypto.get('available_exchanges'):
-                        continue
-
-                    valid_cryptos.append({
-                        "symbol": crypto["symbol"],
-                        "available_exchanges": crypto["available_exchanges"],
-                        "currency_base": crypto.get("currency_base"),
-                        "currency_quote": crypto.get("currency_quote"),
-                        "updated_at": datetime.utcnow()
-                    })
-
-                # Batch insert with composite primary key (symbol, mic_code)
-                if valid_cryptos:
-                    await db.execute(
-                        text("""
-                            INSERT INTO crypto_list (symbol, available_exchanges, currency_base, currency_quote, updated_at)
-                            VALUES (:symbol, :available_exchanges, :currency_base, :currency_quote, :updated_at)
-                            ON CONFLICT (symbol) DO UPDATE SET
-                                available_exchanges = EXCLUDED.available_exchanges,
-                                currency_base = EXCLUDED.currency_base,
-                                currency_quote = EXCLUDED.currency_quote,
-                                updated_at = EXCLUDED.updated_at
-                        """),
-                        valid_cryptos
-                    )
+                # Records are yielded as COPY tuples directly (one updated_at for the whole batch)
+                records = _crypto_records(cryptos, datetime.utcnow())
+
+                # Bulk load with COPY into a staging table, then upsert on the primary key (symbol)
+                # and sweep delisted ones
+                await db.execute(text(_CREATE_CRYPTO_STAGING_SQL))
+                conn = await get_driver_connection(db)
+                copied = await conn.copy_records_to_table(
+                    "crypto_list_staging",
+                    records=records,
+                    columns=_CRYPTO_COLUMNS
+                )
+
+                # An empty listing is treated as a failed fetch, not a wipe
+                count = copied.split()[-1]
+                if count == "0":
+                    print("⚠️ Cryptocurrencies list came back empty, keeping the current one")
+                    await db.rollback()
+                    return
+
+                await conn.execute(_CRYPTO_MERGE_SQL)
+                await conn.execute(_CRYPTO_SWEEP_SQL)
 
                 await db.commit()
                 print(
-                    f"✅ Successfully updated {len(valid_cryptos)} cryptocurrencies")
+                    f"✅ Successfully updated {count} cryptocurrencies")
 
             except Exception as e:
                 print(f"❌ Error updating cryptocurrencies in DB: {e}")
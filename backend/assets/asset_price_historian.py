@@ -1,16 +1,54 @@
 import asyncio
+from collections import OrderedDict, defaultdict
 from datetime import datetime, timedelta
-from typing import List, Dict
+from operator import itemgetter
+from typing import List, Dict, Optional, Tuple
 import httpx
-from sqlalchemy import text, select
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, or_, text, select, true, update
+from sqlalchemy.orm import aliased
 
 from assets.bonds.update_bonds_prices import calculate_bond_value
-from database.database import AsyncSessionLocal, SessionLocal
+from database.database import AsyncSessionLocal, get_driver_connection
 from database.models import Asset, AssetPrice, AssetType
-from assets.asset_fetcher import TwelveDataProvider
+from assets.asset_fetcher import TwelveDataProvider, get_provider
 import traceback
 
+# Twelve Data accepts up to 8 comma-separated symbols per time_series request
+_BATCH_SIZE = 8
+
+# Above this many rows _insert_prices loads through COPY instead of executemany
+_COPY_THRESHOLD = 500
+
+_PRICE_COLUMNS = ["symbol", "mic_code", "currency", "datetime", "interval",
+                  "open", "high", "low", "close", "volume", "exchange"]
+_price_record = itemgetter(*_PRICE_COLUMNS)
+
+# Built once at import; SQLAlchemy caches the compiled form of the text() construct
+_INSERT_PRICES_STMT = text("""
+    INSERT INTO asset_prices (symbol, mic_code,  currency, datetime, interval, open, high, low, close, volume, exchange)
+    VALUES (:symbol, :mic_code, :currency, :datetime, :interval, :open, :high, :low, :close, :volume, :exchange)
+    ON CONFLICT (symbol, mic_code, datetime, interval) DO NOTHING
+""")
+
+_MERGE_PRICES_STAGING_SQL = """
+    INSERT INTO asset_prices (symbol, mic_code, currency, datetime, interval, open, high, low, close, volume, exchange)
+    SELECT symbol, mic_code, currency, datetime, interval, open, high, low, close, volume, exchange
+    FROM asset_prices_staging
+    ON CONFLICT (symbol, mic_code, datetime, interval) DO NOTHING
+"""
+
+# LRU cache of get_asset_price_at_datetime results keyed by (asset_id, target_datetime)
+_PRICE_CACHE_SIZE = 10000
+_price_at_datetime_cache: "OrderedDict[Tuple[int, datetime], float]" = OrderedDict()
+
+# Spelled out rather than LIKE asset_prices, which would copy the NOT NULL id column
+_CREATE_PRICES_STAGING = text("""
+    CREATE TEMP TABLE IF NOT EXISTS asset_prices_staging (
+        symbol VARCHAR, mic_code VARCHAR, currency VARCHAR, datetime TIMESTAMP, interval VARCHAR,
+        open FLOAT, high FLOAT, low FLOAT, close FLOAT, volume INTEGER, exchange VARCHAR
+    ) ON COMMIT DROP
+""")
+
 
 async def backfill_asset_prices(symbol: str, mic_code: str, exchange: str, purchase_date: datetime):
     """
@@ -26,64 +64,61 @@ async def backfill_asset_prices(symbol: str, mic_code: str, exchange: str, purch
     print(
         f"📊 Backfilling prices for {symbol} on {mic_code} from {purchase_date}")
 
-    provider = TwelveDataProvider()
+    provider = get_provider()
     now = datetime.utcnow()
 
     async with AsyncSessionLocal() as db:
         try:
             # Check if we already have data FOR OR BEFORE purchase date
-            existing_check = await db.execute(
-                select(AssetPrice)
+            has_history = await db.scalar(
+                select(1)
                 .where(AssetPrice.symbol == symbol)
                 .where(AssetPrice.mic_code == mic_code)
                 .where(AssetPrice.exchange == exchange)
                 .where(AssetPrice.datetime <= purchase_date)
-                .order_by(AssetPrice.datetime.desc())
                 .limit(1)
             )
 
-            earliest_existing = existing_check.scalar_one_or_none()
-
-            if earliest_existing and earliest_existing.datetime <= purchase_date:
+            if has_history:
                 print(
-                    f"✅ {symbol} on {mic_code} already has historical data from {earliest_existing.datetime}, skipping backfill")
+                    f"✅ {symbol} on {mic_code} already has historical data from before {purchase_date}, skipping backfill")
                 return
 
             # Fetch hourly data for last 30 days
             thirty_days_ago = now - timedelta(days=30)
             if purchase_date < thirty_days_ago:
-                # Fetch hourly for last 30 days
+                # Fetch hourly for last 30 days and daily from purchase_date to 30 days ago
+                # concurrently - the two requests are independent
                 print(f"  Fetching hourly data (last 30 days)...")
-                hourly_data = await provider.get_historical_prices(
-                    symbol=symbol,
-                    mic_code=mic_code,
-                    exchange=exchange,
-                    interval="1h",
-                    start_date=thirty_days_ago.strftime("%Y-%m-%d %H:%M:%S"),
-                    end_date=now.strftime("%Y-%m-%d %H:%M:%S")
-                )
-
-                # Insert hourly data
-                await _insert_prices(db, symbol, mic_code, exchange, "1hour", hourly_data)
-
-                # Fetch daily data from purchase_date to 30 days ago
                 print(
                     f"  Fetching daily data ({purchase_date.date()} to {thirty_days_ago.date()})...")
-                daily_data = await provider.get_historical_prices(
-                    symbol=symbol,
-                    mic_code=mic_code,
-                    exchange=exchange,
-                    interval="1day",
-                    start_date=purchase_date.strftime("%Y-%m-%d"),
-                    end_date=thirty_days_ago.strftime("%Y-%m-%d")
+                (hourly_currency, hourly_data), (daily_currency, daily_data) = await asyncio.gather(
+                    provider.get_historical_prices(
+                        symbol=symbol,
+                        mic_code=mic_code,
+                        exchange=exchange,
+                        interval="1h",
+                        start_date=thirty_days_ago.strftime(
+                            "%Y-%m-%d %H:%M:%S"),
+                        end_date=now.strftime("%Y-%m-%d %H:%M:%S")
+                    ),
+                    provider.get_historical_prices(
+                        symbol=symbol,
+                        mic_code=mic_code,
+                        exchange=exchange,
+                        interval="1day",
+                        start_date=purchase_date.strftime("%Y-%m-%d"),
+                        end_date=thirty_days_ago.strftime("%Y-%m-%d")
+                    )
                 )
 
-                # Insert daily data
-                await _insert_prices(db, symbol, mic_code, exchange, "1day", daily_data)
+                # Insert hourly and daily data (one session, so sequentially)
+                await _insert_prices(db, symbol, mic_code, exchange, "1hour", hourly_data, hourly_currency)
+                await _insert_prices(db, symbol, mic_code, exchange, "1day", daily_data, daily_currency)
             else:
                 # Purchase was within last 30 days, only fetch hourly
                 print(f"  Fetching hourly data from purchase date...")
-                hourly_data = await provider.get_historical_prices(
+                currency, hourly_data = await provider.get_historical_prices(
                     symbol=symbol,
                     mic_code=mic_code,
                     exchange=exchange,
@@ -93,9 +128,10 @@ async def backfill_asset_prices(symbol: str, mic_code: str, exchange: str, purch
                 )
 
                 # Insert hourly data
-                await _insert_prices(db, symbol, mic_code, exchange, "1hour", hourly_data)
+                await _insert_prices(db, symbol, mic_code, exchange, "1hour", hourly_data, currency)
 
             await db.commit()
+            invalidate_asset_price_cache()
             print(f"✅ Backfilled prices for {symbol} on {mic_code}")
 
         except Exception as e:
@@ -105,28 +141,42 @@ async def backfill_asset_prices(symbol: str, mic_code: str, exchange: str, purch
             raise
 
 
-async def _insert_prices(db, symbol: str, mic_code: str, exchange: str, interval: str, price_data: List[Dict]):
+async def _insert_prices(db, symbol: str, mic_code: str, exchange: str, interval: str, price_data: List[Dict],
+                         currency: Optional[str] = None):
     """Insert price data into database using (symbol, mic_code) composite key"""
     if not price_data:
         return
 
+    valid_prices = _price_rows(
+        symbol, mic_code, exchange, interval, price_data, currency)
+
+    if valid_prices:
+        await _write_price_rows(db, valid_prices)
+        print(
+            f"  Inserted {len(valid_prices)} {interval} price records for {symbol} on {mic_code}")
+
+
+def _price_rows(symbol: str, mic_code: str, exchange: str, interval: str, price_data: List[Dict],
+                currency: Optional[str] = None) -> List[Dict]:
+    """Convert API candles into asset_prices rows, skipping invalid ones"""
+    # Crypto pairs may come without a quote currency in the meta, fall back to the pair's quote
+    currency = currency or symbol.split("/")[1]
+
     valid_prices = []
+    skipped = 0
     for price in price_data:
         try:
-            # Parse datetime string to datetime object
+            # Parse datetime string to datetime object - on Python 3.11+ fromisoformat
+            # is a C parser covering "2024-01-15", "2024-01-15 09:30:00" and a "Z" suffix
             dt = price["datetime"]
             if isinstance(dt, str):
-                # Handle both date and datetime formats
-                if 'T' in dt or ' ' in dt:
-                    dt = datetime.fromisoformat(dt.replace('Z', '+00:00'))
-                else:
-                    dt = datetime.strptime(dt, "%Y-%m-%d")
+                dt = datetime.fromisoformat(dt)
 
             valid_prices.append({
                 "symbol": symbol,
                 "mic_code": mic_code,
                 "exchange": exchange,
-                "currency": price["currency"] or symbol.split("/")[1],
+                "currency": currency,
                 "datetime": dt,  # Now a datetime object
                 "interval": interval,
                 "open": float(price["open"]),
@@ -135,21 +185,237 @@ async def _insert_prices(db, symbol: str, mic_code: str, exchange: str, interval
                 "close": float(price["close"]),
                 "volume": int(price["volume"]) if price.get("volume") else 0
             })
-        except (KeyError, ValueError) as e:
-            print(f"⚠️ Skipping invalid price data: {e}")
-            continue
+        except (KeyError, ValueError):
+            skipped += 1
 
-    if valid_prices:
-        await db.execute(
-            text("""
-                INSERT INTO asset_prices (symbol, mic_code,  currency, datetime, interval, open, high, low, close, volume, exchange)
-                VALUES (:symbol, :mic_code, :currency, :datetime, :interval, :open, :high, :low, :close, :volume, :exchange)
-                ON CONFLICT (symbol, mic_code, datetime, interval) DO NOTHING
-            """),
-            valid_prices
-        )
+    # One line per response rather than one per bad candle
+    if skipped:
         print(
-            f"  Inserted {len(valid_prices)} {interval} price records for {symbol} on {mic_code}")
+            f"⚠️ Skipped {skipped} invalid {interval} price records for {symbol} on {mic_code}")
+
+    return valid_prices
+
+
+async def _write_price_rows(db, valid_prices: List[Dict]):
+    """Insert asset_prices rows, keeping existing candles on conflict"""
+    if len(valid_prices) > _COPY_THRESHOLD:
+        # Large backfills: COPY into a staging table, then merge with the same
+        # ON CONFLICT DO NOTHING semantics as the executemany path
+        await db.execute(_CREATE_PRICES_STAGING)
+        conn = await get_driver_connection(db)
+        await conn.copy_records_to_table(
+            "asset_prices_staging",
+            records=map(_price_record, valid_prices),
+            columns=_PRICE_COLUMNS
+        )
+        await conn.execute(_MERGE_PRICES_STAGING_SQL)
+        # The staging table lives until commit - empty it for the next call in this transaction
+        await conn.execute("TRUNCATE asset_prices_staging")
+    else:
+        # Executemany - each row is bound separately, so no bind parameter limit applies
+        await db.execute(_INSERT_PRICES_STMT, valid_prices)
+
+
+async def backfill_asset_prices_bulk(assets: List[Tuple[str, str, str, datetime]]):
+    """
+    Backfill historical prices for several newly added assets at once.
+
+    Assets are (symbol, mic_code, exchange, purchase_date) tuples. Symbols of the same exchange
+    share batched time_series requests (hourly for the last 30 days, daily before that, from the
+    earliest purchase date in the batch) and all rows are written in a single transaction.
+    """
+    print(f"📊 Backfilling prices for {len(assets)} assets")
+
+    provider = get_provider()
+    now = datetime.utcnow()
+    thirty_days_ago = now - timedelta(days=30)
+
+    async with AsyncSessionLocal() as db:
+        try:
+            # Skip assets that already have data FOR OR BEFORE purchase date -
+            # earliest stored candle of every asset, in one grouped query. Crypto has no
+            # mic_code, and a tuple IN never matches NULL, so each asset gets its own
+            # equality clause (== None renders as IS NULL)
+            keys = {(symbol, mic_code, exchange)
+                    for symbol, mic_code, exchange, _ in assets}
+            earliest_result = await db.execute(
+                select(AssetPrice.symbol, AssetPrice.mic_code, AssetPrice.exchange,
+                       func.min(AssetPrice.datetime))
+                .where(or_(*(
+                    and_(AssetPrice.symbol == symbol, AssetPrice.mic_code == mic_code,
+                         AssetPrice.exchange == exchange)
+                    for symbol, mic_code, exchange in keys
+                )))
+                .group_by(AssetPrice.symbol, AssetPrice.mic_code, AssetPrice.exchange)
+            )
+            earliest = {(symbol, mic_code, exchange): earliest_dt
+                        for symbol, mic_code, exchange, earliest_dt in earliest_result}
+
+            pending = []
+            for symbol, mic_code, exchange, purchase_date in assets:
+                earliest_dt = earliest.get((symbol, mic_code, exchange))
+                if earliest_dt and earliest_dt <= purchase_date:
+                    print(
+                        f"✅ {symbol} on {mic_code} already has historical data, skipping backfill")
+                    continue
+
+                pending.append((symbol, mic_code, exchange, purchase_date))
+
+            # The same asset may be bought more than once - backfill from its earliest purchase
+            purchase_dates = {}
+            for symbol, mic_code, exchange, purchase_date in pending:
+                key = (symbol, mic_code, exchange)
+                purchase_dates[key] = min(
+                    purchase_dates.get(key, purchase_date), purchase_date)
+
+            valid_prices = []
+
+            async def collect(symbols: List[str], mic_code: str, exchange: str, interval: str,
+                              db_interval: str, start_date: str, end_date: str):
+                # Runs inside the bulk create request - ahead of the scheduled jobs
+                results = await provider.get_historical_prices_batch(
+                    symbols=symbols,
+                    mic_code=mic_code,
+                    exchange=exchange,
+                    interval=interval,
+                    start_date=start_date,
+                    end_date=end_date,
+                    priority=True
+                )
+
+                for symbol, result in results.items():
+                    if isinstance(result, Exception):
+                        print(
+                            f"  ❌ Error fetching {symbol} on {mic_code}: {result}")
+                        continue
+
+                    currency, price_data = result
+                    valid_prices.extend(_price_rows(
+                        symbol, mic_code, exchange, db_interval, price_data, currency))
+
+            for mic_code, exchange, symbols in _batch_asset_tuples(list(purchase_dates)):
+                batch_dates = [purchase_dates[(symbol, mic_code, exchange)]
+                               for symbol in symbols]
+
+                # Hourly data for the last 30 days (or from the earliest purchase, if more recent)
+                hourly_start = max(min(batch_dates), thirty_days_ago)
+                await collect(symbols, mic_code, exchange, "1h", "1hour",
+                              hourly_start.strftime("%Y-%m-%d %H:%M:%S"),
+                              now.strftime("%Y-%m-%d %H:%M:%S"))
+
+                # Daily data from the earliest purchase to 30 days ago
+                daily_symbols = [symbol for symbol, purchase_date in zip(symbols, batch_dates)
+                                 if purchase_date < thirty_days_ago]
+                if daily_symbols:
+                    await collect(daily_symbols, mic_code, exchange, "1day", "1day",
+                                  min(batch_dates).strftime("%Y-%m-%d"),
+                                  thirty_days_ago.strftime("%Y-%m-%d"))
+
+            if valid_prices:
+                await _write_price_rows(db, valid_prices)
+
+            await db.commit()
+            invalidate_asset_price_cache()
+            print(
+                f"✅ Backfilled {len(valid_prices)} price records for {len(pending)} assets")
+
+        except Exception as e:
+            await db.rollback()
+            print(f"❌ Error backfilling assets: {e}")
+            print(traceback.format_exc())
+            raise
+
+
+def _batch_asset_tuples(asset_tuples: List[Tuple[str, str, str]]) -> List[Tuple[str, str, List[str]]]:
+    """Group (symbol, mic_code, exchange) tuples by exchange into batches of at most _BATCH_SIZE symbols"""
+    symbols_by_exchange = defaultdict(list)
+    for symbol, mic_code, exchange in asset_tuples:
+        symbols_by_exchange[(mic_code, exchange)].append(symbol)
+
+    return [
+        (mic_code, exchange, symbols[i:i + _BATCH_SIZE])
+        for (mic_code, exchange), symbols in symbols_by_exchange.items()
+        for i in range(0, len(symbols), _BATCH_SIZE)
+    ]
+
+
+async def _fetch_and_store_batches(provider: TwelveDataProvider, asset_tuples: List[Tuple[str, str, str]],
+                                   interval: str, db_interval: str, start_date: str, end_date: str):
+    """
+    Fetch prices for the tracked assets, one batch request per exchange group, and store them.
+
+    Batches run concurrently; the provider's rate limiter paces the requests and the semaphore
+    bounds how many HTTP calls and DB sessions are open at once.
+    """
+    semaphore = asyncio.Semaphore(provider.rate_limiter.calls)
+
+    async def fetch_batch(mic_code: str, exchange: str, symbols: List[str]):
+        async with semaphore:
+            try:
+                results = await provider.get_historical_prices_batch(
+                    symbols=symbols,
+                    mic_code=mic_code,
+                    exchange=exchange,
+                    interval=interval,
+                    start_date=start_date,
+                    end_date=end_date
+                )
+            except Exception as e:
+                print(
+                    f"  ❌ Error fetching {', '.join(symbols)} on {mic_code}: {e}")
+                print(traceback.format_exc())
+                return
+
+            try:
+                async with AsyncSessionLocal() as db:
+                    for symbol, result in results.items():
+                        if isinstance(result, Exception):
+                            print(
+                                f"  ❌ Error fetching {symbol} on {mic_code}: {result}")
+                            continue
+
+                        currency, price_data = result
+                        if not price_data:
+                            continue
+
+                        # Savepoint per symbol - a failing insert only drops that symbol, not the batch
+                        try:
+                            async with db.begin_nested():
+                                await _insert_prices(db, symbol, mic_code, exchange, db_interval, price_data, currency)
+                        except Exception as e:
+                            print(
+                                f"  ❌ Error storing {symbol} on {mic_code}: {e}")
+
+                    # One commit (and WAL flush) per batch of up to 8 symbols
+                    await db.commit()
+                    invalidate_asset_price_cache()
+            except Exception as e:
+                print(
+                    f"  ❌ Error storing {', '.join(symbols)} on {mic_code}: {e}")
+                print(traceback.format_exc())
+
+    await asyncio.gather(*[
+        fetch_batch(mic_code, exchange, symbols)
+        for mic_code, exchange, symbols in _batch_asset_tuples(asset_tuples)
+    ], return_exceptions=True)
+
+
+async def _get_tracked_asset_tuples() -> List[Tuple[str, str, str]]:
+    """Unique (symbol, mic_code, exchange) of all STOCKS and CRYPTO assets, read without blocking the event loop"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Asset.symbol, Asset.mic_code, Asset.exchange)
+            .where(
+                Asset.type.in_([AssetType.STOCKS, AssetType.CRYPTO]),
+                Asset.symbol.isnot(None),
+                Asset.mic_code.isnot(None),
+                Asset.exchange.isnot(None)
+            )
+            .distinct()
+        )
+
+        return [(symbol, mic_code, exchange)
+                for symbol, mic_code, exchange in result]
 
 
 async def fetch_latest_prices_for_tracked_assets():
@@ -157,22 +423,12 @@ async def fetch_latest_prices_for_tracked_assets():
     Fetch latest prices for all assets (STOCKS and CRYPTO) in user portfolios.
     Groups by (symbol, mic_code, exchange) to get unique asset identifiers.
     """
-    print(f"📈 [{datetime.utcnow()}] Fetching latest prices for tracked assets...")
+    # Read the clock once - the log line and the fetch window share it
+    now = datetime.utcnow()
+    print(f"📈 [{now}] Fetching latest prices for tracked assets...")
 
     # Get unique (symbol, mic_code, exchange) pairs from all user assets
-    db = SessionLocal()
-    try:
-        tracked_assets = db.query(Asset.symbol, Asset.mic_code, Asset.exchange).filter(
-            Asset.type.in_([AssetType.STOCKS, AssetType.CRYPTO]),
-            Asset.symbol.isnot(None),
-            Asset.mic_code.isnot(None),
-            Asset.exchange.isnot(None)
-        ).distinct().all()
-
-        asset_tuples = [(symbol, mic_code, exchange)
-                        for symbol, mic_code, exchange in tracked_assets]
-    finally:
-        db.close()
+    asset_tuples = await _get_tracked_asset_tuples()
 
     if not asset_tuples:
         print("  No assets to track")
@@ -180,94 +436,101 @@ async def fetch_latest_prices_for_tracked_assets():
 
     print(f"  Tracking {len(asset_tuples)} unique assets")
 
-    provider = TwelveDataProvider()
+    provider = get_provider()
 
-    for symbol, mic_code, exchange in asset_tuples:
-        try:
-            # Fetch latest hourly price using date range
-            now = datetime.utcnow()
-            one_hour_ago = now - timedelta(hours=1)
-            print(one_hour_ago.strftime("%Y-%m-%d %H:%M:%S"),
-                  now.strftime("%Y-%m-%d %H:%M:%S"))
-
-            hourly_data = await provider.get_historical_prices(
-                symbol=symbol,
-                mic_code=mic_code,
-                exchange=exchange,
-                interval="1h",
-                start_date=one_hour_ago.strftime("%Y-%m-%d %H:%M:%S"),
-                end_date=now.strftime("%Y-%m-%d %H:%M:%S")
-            )
+    # Fetch latest hourly price using date range, formatted once for all batches
+    now_str = now.strftime("%Y-%m-%d %H:%M:%S")
+    hour_ago_str = (now - timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
 
-            if hourly_data:
-                async with AsyncSessionLocal() as db:
-                    await _insert_prices(db, symbol, mic_code, exchange, "1hour", hourly_data)
-                    await db.commit()
-
-            # Rate limiting: 8 calls/minute for free tier
-            await asyncio.sleep(8)
-
-        except Exception as e:
-            print(f"  ❌ Error fetching {symbol} on {mic_code}: {e}")
-            print(traceback.format_exc())
-            continue
+    # Batched requests - the provider's rate limiter keeps us within 8 credits/minute
+    await _fetch_and_store_batches(
+        provider, asset_tuples, "1h", "1hour",
+        start_date=hour_ago_str,
+        end_date=now_str
+    )
 
     print(f"✅ Finished fetching latest prices")
 
 
 async def fetch_daily_prices_for_tracked_assets():
     """Fetch daily closing prices for all tracked assets"""
-    print(f"📊 [{datetime.utcnow()}] Fetching daily prices for tracked assets...")
-
-    db = SessionLocal()
-    try:
-        tracked_assets = db.query(Asset.symbol, Asset.mic_code, Asset.exchange).filter(
-            Asset.type.in_([AssetType.STOCKS, AssetType.CRYPTO]),
-            Asset.symbol.isnot(None),
-            Asset.mic_code.isnot(None),
-            Asset.exchange.isnot(None)
-        ).distinct().all()
-
-        asset_tuples = [(symbol, mic_code, exchange)
-                        for symbol, mic_code, exchange in tracked_assets]
-    finally:
-        db.close()
+    today = datetime.utcnow()
+    print(f"📊 [{today}] Fetching daily prices for tracked assets...")
+
+    asset_tuples = await _get_tracked_asset_tuples()
 
     if not asset_tuples:
         print("  No assets to track")
         return
 
-    provider = TwelveDataProvider()
+    provider = get_provider()
 
-    for symbol, mic_code, exchange in asset_tuples:
-        try:
-            # Fetch latest daily price using date range
-            today = datetime.utcnow()
-            yesterday = today - timedelta(days=1)
-
-            daily_data = await provider.get_historical_prices(
-                symbol=symbol,
-                mic_code=mic_code,
-                exchange=exchange,
-                interval="1day",
-                start_date=yesterday.strftime("%Y-%m-%d"),
-                end_date=today.strftime("%Y-%m-%d")
-            )
+    # Fetch latest daily price using date range, formatted once for all batches
+    today_str = today.strftime("%Y-%m-%d")
+    yesterday_str = (today - timedelta(days=1)).strftime("%Y-%m-%d")
 
-            if daily_data:
-                async with AsyncSessionLocal() as db:
-                    await _insert_prices(db, symbol, mic_code, exchange, "1day", daily_data)
-                    await db.commit()
+    await _fetch_and_store_batches(
+        provider, asset_tuples, "1day", "1day",
+        start_date=yesterday_str,
+        end_date=today_str
+    )
 
-            # Rate limiting
-            await asyncio.sleep(8)
+    print(f"✅ Finished fetching daily prices")
 
-        except Exception as e:
-            print(f"  ❌ Error fetching {symbol} on {mic_code}: {e}")
-            print(traceback.format_exc())
-            continue
 
-    print(f"✅ Finished fetching daily prices")
+def _active_assets_filter(asset, asset_type: AssetType, user_id: Optional[int]) -> list:
+    """WHERE clauses selecting the active assets of one type (of one user, or all with user_id None)"""
+    clauses = [asset.status == 'ACTIVE', asset.type == asset_type]
+    if user_id is not None:
+        clauses.append(asset.user_id == user_id)
+    return clauses
+
+
+async def update_current_prices_to_latest_close(db, asset_type: AssetType, user_id: Optional[int] = None) -> int:
+    """
+    Set current_price of active assets of one type to their latest stored close, in one UPDATE ... FROM.
+
+    The assets are selected inside the statement, so no ids are sent. Only assets whose price
+    actually changes are written. Returns the number of updated assets.
+    """
+    # Distinct (symbol, mic_code) pairs of the selected assets, each joined LATERAL to its latest
+    # candle: one backward LIMIT 1 probe of idx_unique_price (symbol, mic_code, datetime, ...) per
+    # pair instead of reading and sorting every stored candle. mic_code is part of the asset_prices
+    # primary key, so it is never NULL there and an asset without one simply has no price
+    owned = aliased(Asset)
+    pairs = (
+        select(owned.symbol, owned.mic_code)
+        .where(*_active_assets_filter(owned, asset_type, user_id))
+        .distinct()
+        .subquery()
+    )
+    latest_close = (
+        select(AssetPrice.close)
+        .where(AssetPrice.symbol == pairs.c.symbol,
+               AssetPrice.mic_code == pairs.c.mic_code)
+        .order_by(AssetPrice.datetime.desc())
+        .limit(1)
+        .lateral()
+    )
+    latest = (
+        select(pairs.c.symbol, pairs.c.mic_code, latest_close.c.close)
+        .select_from(pairs.join(latest_close, true()))
+        .subquery()
+    )
+
+    result = await db.execute(
+        update(Asset)
+        .where(
+            *_active_assets_filter(Asset, asset_type, user_id),
+            Asset.symbol == latest.c.symbol,
+            Asset.mic_code == latest.c.mic_code,
+            Asset.current_price.is_distinct_from(latest.c.close)
+        )
+        .values(current_price=latest.c.close)
+        .execution_options(synchronize_session=False)
+    )
+
+    return result.rowcount
 
 
 async def get_asset_price_history(
@@ -290,8 +553,10 @@ async def get_asset_price_history(
         interval = "1day"
 
     async with AsyncSessionLocal() as db:
+        # Select plain columns - rows come back as tuples without ORM object hydration
         result = await db.execute(
-            select(AssetPrice)
+            select(AssetPrice.datetime, AssetPrice.open, AssetPrice.high,
+                   AssetPrice.low, AssetPrice.close, AssetPrice.volume)
             .where(AssetPrice.symbol == symbol)
             .where(AssetPrice.mic_code == mic_code)
             .where(AssetPrice.exchange == exchange)
@@ -301,28 +566,58 @@ async def get_asset_price_history(
             .order_by(AssetPrice.datetime)
         )
 
-        prices = result.scalars().all()
-
         return [
             {
-                "datetime": price.datetime.isoformat(),
-                "open": price.open,
-                "high": price.high,
-                "low": price.low,
-                "close": price.close,
-                "volume": price.volume
+                "datetime": dt.isoformat(),
+                "open": open_,
+                "high": high,
+                "low": low,
+                "close": close,
+                "volume": volume
             }
-            for price in prices
+            for dt, open_, high, low, close, volume in result.all()
         ]
 
 
+def invalidate_asset_price_cache(asset_id: Optional[int] = None) -> None:
+    """Drop cached prices of one asset, or of all assets when no asset_id is given"""
+    if asset_id is None:
+        _price_at_datetime_cache.clear()
+        return
+
+    for key in [key for key in _price_at_datetime_cache if key[0] == asset_id]:
+        del _price_at_datetime_cache[key]
+
+
 async def get_asset_price_at_datetime(
     asset_id: int,
     target_datetime: datetime
 ) -> float:
     """
     Get the asset price at or before the target_datetime.
+
+    Results are cached per (asset_id, target_datetime); portfolio statistics ask for the same
+    asset/date pairs on every recalculation. The exact datetime is the key - a coarser one could
+    serve a price from a candle after the requested time.
     """
+    key = (asset_id, target_datetime)
+    if key in _price_at_datetime_cache:
+        _price_at_datetime_cache.move_to_end(key)
+        return _price_at_datetime_cache[key]
+
+    price = await _get_asset_price_at_datetime(asset_id, target_datetime)
+
+    _price_at_datetime_cache[key] = price
+    if len(_price_at_datetime_cache) > _PRICE_CACHE_SIZE:
+        _price_at_datetime_cache.popitem(last=False)
+
+    return price
+
+
+async def _get_asset_price_at_datetime(
+    asset_id: int,
+    target_datetime: datetime
+) -> float:
     async with AsyncSessionLocal() as db:
         # Get asset details
         result = await db.execute(
@@ -336,9 +631,10 @@ async def get_asset_price_at_datetime(
                 f"Asset with ID {asset_id} not found or missing symbol/mic_code/exchange")
 
         if asset.type in [AssetType.STOCKS, AssetType.CRYPTO]:
-            # Get the latest price at or before target_datetime
+            # Get the latest price at or before target_datetime - only the close is
+            # selected, so idx_asset_prices_lookup answers it with an index-only scan
             result = await db.execute(
-                select(AssetPrice)
+                select(AssetPrice.close)
                 .where(AssetPrice.symbol == asset.symbol)
                 .where(AssetPrice.mic_code == asset.mic_code)
                 .where(AssetPrice.exchange == asset.exchange)
@@ -346,14 +642,14 @@ async def get_asset_price_at_datetime(
                 .order_by(AssetPrice.datetime.desc())
                 .limit(1)
             )
-            price_record = result.scalar_one_or_none()
+            close = result.scalar_one_or_none()
 
-            if not price_record:
+            if close is None:
                 print(
                     f"⚠️ No price data for {asset.symbol} on {asset.mic_code} before {target_datetime}")
                 return asset.purchase_price
 
-            return price_record.close
+            return close
 
         elif asset.type == AssetType.BONDS:
             bond_settings = asset.bond_settings or {}
@@ -390,7 +686,7 @@ async def cleanup_old_price_data():
             # Delete hourly data older than 30 days
             result = await db.execute(
                 text("""
-                    DELETE FROM stock_prices
+                    DELETE FROM asset_prices
                     WHERE interval = '1hour'
                       AND datetime < NOW() - INTERVAL '30 days'
                 """)
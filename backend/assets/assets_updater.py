@@ -6,54 +6,70 @@ import os
 # load_dotenv()  # noqa
 
 from fastapi import Depends
-import requests
 import asyncio
 from datetime import datetime
 import httpx
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from typing import List, Dict, Optional
 from sqlalchemy import select, text
 
 from assets.bonds.update_bonds_prices import update_bonds_prices
-from assets.crypto.update_crypto_prices import update_crypto_prices
+from assets.asset_price_historian import update_current_prices_to_latest_close
 from database.database import AsyncSessionLocal, SessionLocal, get_async_db
 from database.models import Asset, AssetType, AssetPrice
-from assets.stocks.update_stock_prices import update_stock_prices
 
 
 async def update_assets_prices() -> None:
-    """Update current prices for all assets for all users using update_user_assets_prices on each user"""
+    """Update current prices for all assets of all users"""
 
+    # One pass per asset type over every user's assets: each distinct (symbol, mic_code) is looked
+    # up once per run instead of once per owner, and each type is written with a single bulk UPDATE
+    await _update_all_asset_types(user_id=None)
+
+
+async def _update_assets_of_type(user_id: Optional[int], asset_type: AssetType, updater) -> None:
+    """
+    Load the user's active assets of one type in a dedicated session and update their prices.
+    With user_id None, the active assets of all users are loaded.
+    """
     async with AsyncSessionLocal() as async_db:
-        result = await async_db.execute(
-            select(Asset.user_id).distinct()
+        query = select(Asset).where(
+            Asset.status == 'ACTIVE',
+            Asset.type == asset_type
         )
-        user_ids = [row[0] for row in result.fetchall()]
+        if user_id is not None:
+            query = query.where(Asset.user_id == user_id)
+
+        result = await async_db.execute(query)
+        assets = result.scalars().all()
+
+        await updater(async_db, assets)
+
 
-    # Update assets prices for each user concurrently
-    await asyncio.gather(*[
-        update_user_assets_prices(user_id)
-        for user_id in user_ids
-    ])
+async def _update_latest_close_prices(user_id: Optional[int], asset_type: AssetType) -> None:
+    """Set stock or crypto current prices to their latest stored close (one user, or all with user_id None)"""
+    async with AsyncSessionLocal() as async_db:
+        # Assets are selected inside the UPDATE itself - nothing is loaded here
+        updated = await update_current_prices_to_latest_close(async_db, asset_type, user_id)
+
+        if updated:
+            print(f"Updated {updated} {asset_type.value} asset prices")
+
+        await async_db.commit()
 
 
 async def update_user_assets_prices(user_id: int) -> None:
     """Update current prices for all assets"""
+    await _update_all_asset_types(user_id)
 
-    async with AsyncSessionLocal() as async_db:
-        result = await async_db.execute(
-            select(Asset).where(
-                Asset.user_id == user_id,
-                Asset.status == 'ACTIVE'
-            )
-        )
-        assets = result.scalars().all()
-        stocks = [asset for asset in assets if asset.type == AssetType.STOCKS]
-        crypto = [asset for asset in assets if asset.type == AssetType.CRYPTO]
-        bonds = [asset for asset in assets if asset.type == AssetType.BONDS]
 
-        await update_stock_prices(async_db, stocks)
-        await update_crypto_prices(async_db, crypto)
-        await update_bonds_prices(async_db, bonds)
+async def _update_all_asset_types(user_id: Optional[int]) -> None:
+    """Update stocks, crypto and bonds prices of one user (or all users with user_id None)"""
 
-        return assets
+    # Each type is filtered in SQL and updated in its own session, so the three updaters run concurrently.
+    # Stocks and crypto are a single UPDATE each; bonds are valued from the full row (bond_settings)
+    await asyncio.gather(
+        _update_latest_close_prices(user_id, AssetType.STOCKS),
+        _update_latest_close_prices(user_id, AssetType.CRYPTO),
+        _update_assets_of_type(user_id, AssetType.BONDS, update_bonds_prices)
+    )
@@ -8,13 +8,12 @@ import os
 # load_dotenv()  # noqa
 
 from fastapi import Depends
-import requests
 import asyncio
 from datetime import datetime, timezone
 import httpx
 from sqlalchemy.orm import Session
 from typing import List, Dict
-from sqlalchemy import select, text
+from sqlalchemy import select, text, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.database import AsyncSessionLocal, SessionLocal, get_async_db
@@ -32,19 +31,53 @@ def calculate_bond_value(
     purchase_date: str = None,
     maturity_date: str = None,
     interest_rates: dict = None,
-    calculate_maturity_value: bool = False
+    calculate_maturity_value: bool = False,
+    now: datetime = None
 ) -> float:
     """
     Calculate current or maturity value of a bond with daily accrual,
     considering interest rate resets every interestRateResetsFrequency months.
+
+    now (naive UTC) is the valuation time; pass it when valuing many bonds to read the clock once.
     """
 
-    print("Calculating bond value with settings:", {
-        "purchase_price": purchase_price,
-        "maturity_date": maturity_date,
-        "calculating_maturity_value": calculate_maturity_value
-    })
+    if not purchase_date or not maturity_date or not interest_rates:
+        raise ValueError(
+            "purchase_date, maturity_date, and interest_rates must be provided")
+
+    maturity_dt = datetime.fromisoformat(maturity_date.replace("Z", ""))
+    if calculate_maturity_value:
+        end_dt = maturity_dt
+    else:
+        end_dt = now or datetime.utcnow()
+
+    return calculate_bond_values(
+        purchase_price=purchase_price,
+        capitalization_of_interest=capitalization_of_interest,
+        capitalization_frequency=capitalization_frequency,
+        interestRateResetsFrequency=interestRateResetsFrequency,
+        purchase_date=purchase_date,
+        maturity_date=maturity_date,
+        interest_rates=interest_rates,
+        target_dates=[end_dt]
+    )[0]
+
+
+def calculate_bond_values(
+    purchase_price: float,
+    capitalization_of_interest: bool,
+    capitalization_frequency: int = None,
+    interestRateResetsFrequency: int = 12,
+    purchase_date: str = None,
+    maturity_date: str = None,
+    interest_rates: dict = None,
+    target_dates: List[datetime] = None
+) -> List[float]:
+    """
+    Calculate bond values at several dates in a single walk over the accrual periods.
 
+    Values past maturity stay at the maturity value. Returns values in target_dates order.
+    """
     if not purchase_date or not maturity_date or not interest_rates:
         raise ValueError(
             "purchase_date, maturity_date, and interest_rates must be provided")
@@ -53,31 +86,60 @@ def calculate_bond_value(
     purchase_dt = datetime.fromisoformat(purchase_date.replace("Z", ""))
     maturity_dt = datetime.fromisoformat(maturity_date.replace("Z", ""))
 
-    end_dt = maturity_dt if calculate_maturity_value else datetime.utcnow()
-    if end_dt < purchase_dt:
+    if any(target_dt < purchase_dt for target_dt in target_dates):
         raise ValueError("End date is before purchase date")
 
+    # Accrual stops at maturity - without the clamp a matured bond never leaves the loop
+    pending = sorted((min(target_dt, maturity_dt), i)
+                     for i, target_dt in enumerate(target_dates))
+    values = [0.0] * len(target_dates)
+    if not pending:
+        return values
+
+    end_dt = pending[-1][0]
+    # Fallback for periods past the last rate bracket, resolved once instead of per period
+    last_rate_info = interest_rates[str(max(map(int, interest_rates.keys())))]
+
+    # Loop invariant - whether interest is capitalized during the bond's life
+    capitalizes = capitalization_of_interest and capitalization_frequency is not None
+    # Single rate bracket without capitalization - principal and rate never change, so the
+    # value is simple interest over whole days and the period walk can be skipped
+    if not capitalizes and len(interest_rates) == 1:
+        daily_interest = purchase_price * (last_rate_info["rate"] / 100 / 365)
+        for target_dt, index in pending:
+            values[index] = purchase_price + \
+                daily_interest * (target_dt - purchase_dt).days
+        return values
+
+    # Period lengths are constant - build the relativedelta offsets once, not per period
+    reset_delta = relativedelta(months=interestRateResetsFrequency)
+    capitalization_delta = relativedelta(
+        months=capitalization_frequency) if capitalizes else None
+
     principal = purchase_price
     accrued_interest = 0.0
     current_dt = purchase_dt
+    next_target = 0
+
+    # Targets at the purchase date get the purchase price
+    while next_target < len(pending) and pending[next_target][0] <= current_dt:
+        values[pending[next_target][1]] = principal + accrued_interest
+        next_target += 1
 
     while current_dt < end_dt:
         # Obliczamy numer okresu resetu stopy procentowej
         months_passed = ((current_dt.year - purchase_dt.year) * 12 +
                          (current_dt.month - purchase_dt.month)) // interestRateResetsFrequency + 1
         # Pobieramy stopę procentową dla tego okresu, jeśli brak → ostatnia dostępna
-        rate_info = interest_rates.get(str(months_passed),
-                                       interest_rates.get(str(max(map(int, interest_rates.keys())))))
+        rate_info = interest_rates.get(str(months_passed), last_rate_info)
         annual_rate = rate_info["rate"] / 100
 
         # Wyznaczamy następny reset stopy procentowej
-        next_reset_dt = current_dt + \
-            relativedelta(months=interestRateResetsFrequency)
+        next_reset_dt = current_dt + reset_delta
 
         # Wyznaczamy następny moment kapitalizacji
-        if capitalization_of_interest and capitalization_frequency is not None:
-            next_capitalization_dt = current_dt + \
-                relativedelta(months=capitalization_frequency)
+        if capitalizes:
+            next_capitalization_dt = current_dt + capitalization_delta
         else:
             next_capitalization_dt = maturity_dt  # brak kapitalizacji w trakcie
 
@@ -85,27 +147,39 @@ def calculate_bond_value(
         next_dt = min(next_reset_dt, next_capitalization_dt,
                       end_dt, maturity_dt)
 
+        daily_rate = annual_rate / 365
+
+        # Targets inside this period accrue from its start, like a walk ending at them would
+        while next_target < len(pending) and pending[next_target][0] <= next_dt:
+            target_dt, index = pending[next_target]
+            days = (target_dt - current_dt).days
+            values[index] = principal + accrued_interest + \
+                principal * daily_rate * days
+            next_target += 1
+
         # Liczymy liczbę dni w tym okresie
         days = (next_dt - current_dt).days
-        daily_rate = annual_rate / 365
         accrued_interest += principal * daily_rate * days
 
         # Kapitalizacja odsetek
-        if capitalization_of_interest and capitalization_frequency is not None and next_dt == next_capitalization_dt:
+        if capitalizes and next_dt == next_capitalization_dt:
             principal += accrued_interest
             accrued_interest = 0.0
 
         # Przechodzimy do następnego zdarzenia
         current_dt = next_dt
 
-    # Końcowa wartość obligacji
-    return principal + accrued_interest
+    return values
 
 
 async def update_bonds_prices(async_db: AsyncSession, assets: List[Asset]) -> None:
     """Update current prices for all crypto assets with auto_update enabled"""
 
-    # Update prices concurrently
+    # Collect changed prices and write them with one bulk UPDATE by primary key,
+    # instead of dirtying every Asset and flushing one UPDATE per bond
+    price_updates = []
+    # One valuation time for the whole pass (naive UTC, like the stored purchase dates)
+    now = datetime.utcnow()
     for asset in assets:
         if asset.type != AssetType.BONDS:
             continue
@@ -126,9 +200,15 @@ async def update_bonds_prices(async_db: AsyncSession, assets: List[Asset]) -> No
             if asset.purchase_date else None,
             maturity_date=bond_settings.get("maturityDate", None),
             interest_rates=bond_settings.get("interestRates", None),
-            calculate_maturity_value=False
+            calculate_maturity_value=False,
+            now=now
         )
 
-        asset.current_price = new_price
+        if new_price != asset.current_price:
+            price_updates.append(
+                {"id": asset.id, "current_price": new_price})
+
+    if price_updates:
+        await async_db.execute(update(Asset), price_updates)
 
     await async_db.commit()
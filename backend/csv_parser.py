@@ -3,10 +3,80 @@ CSV Parser with Claude API for intelligent parsing of bank statements.
 Handles messy CSVs with header rows, footer rows, and various formats.
 """
 import os
+import re
 import json
+from functools import lru_cache
 from typing import Dict, List, Optional
 from datetime import datetime
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
+
+
+# Markdown code fence around the JSON answer, e.g. "```json\n{...}\n```"
+_CODE_FENCE_START = re.compile(r"^```[a-zA-Z]*\s*\n")
+_CODE_FENCE_END = re.compile(r"\n\s*```\s*$")
+
+# Character budget of the CSV excerpt sent to Claude
+_CSV_HEAD_CHARS = 40_000
+_CSV_TAIL_CHARS = 8_000
+
+# Filled with str.format, so literal braces in the JSON example are doubled
+_PROMPT_TEMPLATE = """You are analyzing a bank statement CSV file. The CSV may have:
+- Header rows with metadata/bank info
+- Column headers somewhere in the middle
+- Transaction rows
+- Footer rows with disclaimers
+- Empty rows
+
+Your task is to extract transaction data and calculate totals.
+
+CSV Content:
+```csv
+{csv_sample}
+```
+
+Instructions:
+1. Find the row with column headers (look for columns like: date, amount, balance, description, etc.)
+2. Identify all transaction rows (skip headers, footers, empty rows)
+3. For each transaction, extract:
+- Transaction date
+- Amount (could be positive/negative in one column, OR separate debit/credit columns)
+- Running balance (if available)
+- Description
+
+4. Calculate:
+- Earliest transaction date (date_start)
+- Latest transaction date (date_end)
+- Total incomes (positive amounts or credit column)
+- Total expenses (negative amounts or debit column, as POSITIVE numbers)
+- Final balance (from last transaction's balance, or calculate from first balance +/- all amounts)
+- Currency (e.g., PLN, USD, EUR)
+- Number of transactions
+
+Return ONLY a JSON object:
+{{
+"date_start": "YYYY-MM-DD",
+"date_end": "YYYY-MM-DD",
+"incomes": float,
+"expenses": float,
+"final_balance": float,
+"transaction_count": int,
+"currency": "PLN"
+}}
+
+CRITICAL RULES:
+- Return ONLY valid JSON, no markdown, no explanations
+- Expenses should be POSITIVE numbers (e.g., 100.00, not -100.00)
+- Incomes should be POSITIVE numbers
+- Dates in YYYY-MM-DD format
+- All amounts as floats (use . for decimals)
+- Skip any rows that are not actual transactions
+"""
+
+
+@lru_cache(maxsize=None)
+def _get_client(api_key: str) -> AsyncAnthropic:
+    """Shared async client per API key, so parsers created per request reuse its connection pool"""
+    return AsyncAnthropic(api_key=api_key)
 
 
 class CSVParser:
@@ -14,9 +84,9 @@ class CSVParser:
         self.api_key = os.getenv("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY environment variable not set")
-        self.client = Anthropic(api_key=self.api_key)
+        self.client = _get_client(self.api_key)
 
-    def parse_csv_with_claude(self, csv_content: str, asset_id: Optional[int] = None) -> Dict:
+    async def parse_csv_with_claude(self, csv_content: str, asset_id: Optional[int] = None) -> Dict:
         """
         Let Claude handle the entire CSV parsing intelligently.
         Claude will:
@@ -37,92 +107,34 @@ class CSVParser:
         }
         """
 
-        # Truncate if too long (keep first 100 lines + last 20 lines for context)
-        lines = csv_content.split('\n')
-        if len(lines) > 150:
-            csv_sample = '\n'.join(
-                lines[:100] + ['...', '(middle rows omitted)', '...'] + lines[-20:])
+        # Truncate if too long - keep the head (metadata, column headers, first transactions) and
+        # the tail (last transactions, closing balance), cut at line boundaries. Budgeted in
+        # characters rather than lines, so long rows can't blow up the prompt
+        if len(csv_content) > _CSV_HEAD_CHARS + _CSV_TAIL_CHARS:
+            head = csv_content[:_CSV_HEAD_CHARS].rsplit('\n', 1)[0]
+            tail = csv_content[-_CSV_TAIL_CHARS:].split('\n', 1)[-1]
+            csv_sample = head + '\n...\n(middle rows omitted)\n...\n' + tail
         else:
             csv_sample = csv_content
 
-            prompt = f"""You are analyzing a bank statement CSV file. The CSV may have:
-                - Header rows with metadata/bank info
-                - Column headers somewhere in the middle
-                - Transaction rows
-                - Footer rows with disclaimers
-                - Empty rows
-
-                Your task is to extract transaction data and calculate totals.
-
-                CSV Content:
-                ```csv
-                {csv_sample}
-                ```
-
-                Instructions:
-                1. Find the row with column headers (look for columns like: date, amount, balance, description, etc.)
-                2. Identify all transaction rows (skip headers, footers, empty rows)
-                3. For each transaction, extract:
-                - Transaction date
-                - Amount (could be positive/negative in one column, OR separate debit/credit columns)
-                - Running balance (if available)
-                - Description
-
-                4. Calculate:
-                - Earliest transaction date (date_start)
-                - Latest transaction date (date_end)
-                - Total incomes (positive amounts or credit column)
-                - Total expenses (negative amounts or debit column, as POSITIVE numbers)
-                - Final balance (from last transaction's balance, or calculate from first balance +/- all amounts)
-                - Currency (e.g., PLN, USD, EUR)
-                - Number of transactions
-
-                Return ONLY a JSON object:
-                {{
-                "date_start": "YYYY-MM-DD",
-                "date_end": "YYYY-MM-DD",
-                "incomes": float,
-                "expenses": float,
-                "final_balance": float,
-                "transaction_count": int,
-                "currency": "PLN"
-                }}
-
-                CRITICAL RULES:
-                - Return ONLY valid JSON, no markdown, no explanations
-                - Expenses should be POSITIVE numbers (e.g., 100.00, not -100.00)
-                - Incomes should be POSITIVE numbers
-                - Dates in YYYY-MM-DD format
-                - All amounts as floats (use . for decimals)
-                - Skip any rows that are not actual transactions
-                """
-
-        message = self.client.messages.create(
+        prompt = _PROMPT_TEMPLATE.format(csv_sample=csv_sample)
+
+        # Awaited, so the upload request doesn't block the event loop while Claude responds.
+        # Streamed - text deltas are accumulated as they arrive and the connection never
+        # sits idle for the whole generation
+        async with self.client.messages.stream(
             model="claude-sonnet-4-20250514",
             max_tokens=2000,
             messages=[
                 {"role": "user", "content": prompt}
             ]
-        )
-
-        response_text = message.content[0].text.strip()
+        ) as stream:
+            response_text = (await stream.get_final_text()).strip()
 
         # Remove markdown code blocks if present
         if response_text.startswith("```"):
-            lines = response_text.split('\n')
-            # Find first line that's not a code fence
-            start_idx = 1
-            for i, line in enumerate(lines[1:], 1):
-                if not line.strip().startswith('```') and line.strip():
-                    start_idx = i
-                    break
-            # Find last line that's not a code fence
-            end_idx = len(lines) - 1
-            for i in range(len(lines) - 1, 0, -1):
-                if not lines[i].strip().startswith('```') and lines[i].strip():
-                    end_idx = i
-                    break
-            response_text = '\n'.join(lines[start_idx:end_idx + 1])
+            response_text = _CODE_FENCE_START.sub("", response_text)
+            response_text = _CODE_FENCE_END.sub("", response_text)
 
         try:
             parsed_data = json.loads(response_text)
@@ -152,9 +164,9 @@ class CSVParser:
 
         return parsed_data
 
-    def parse_csv(self, csv_content: str, asset_id: Optional[int] = None) -> Dict:
+    async def parse_csv(self, csv_content: str, asset_id: Optional[int] = None) -> Dict:
         """
         Main entry point for CSV parsing.
         Uses Claude to intelligently parse the entire CSV.
         """
-        return self.parse_csv_with_claude(csv_content, asset_id)
+        return await self.parse_csv_with_claude(csv_content, asset_id)
@@ -1,20 +1,61 @@
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
 from database.models import CurrencyExchangeRate
 from database.database import SessionLocal
 
+# Rates change only when update_currencies runs (daily), which also clears the cache
+_RATE_CACHE_TTL = 60 * 60
+
+# {source: {target: rate}} snapshot of the whole rates table and its monotonic expiry
+_rates_snapshot: Optional[Dict[str, Dict[str, float]]] = None
+_rates_snapshot_expires_at = 0.0
+
+
+def invalidate_rate_cache() -> None:
+    """Drop cached exchange rates (call after the rates table changes)"""
+    global _rates_snapshot
+    _rates_snapshot = None
+
+
+def load_rates_snapshot(db: Session) -> Dict[str, Dict[str, float]]:
+    """Read all exchange rates in one query into a {source: {target: rate}} dict"""
+    rates: Dict[str, Dict[str, float]] = {}
+    for source, target, rate in db.execute(
+        select(CurrencyExchangeRate.source_currency,
+               CurrencyExchangeRate.target_currency, CurrencyExchangeRate.rate)
+    ):
+        rates.setdefault(source, {})[target] = rate
+
+    return rates
+
+
+def get_rates_snapshot() -> Dict[str, Dict[str, float]]:
+    """Cached rates snapshot, reloaded from the database once it expires or is invalidated"""
+    global _rates_snapshot, _rates_snapshot_expires_at
+
+    now = time.monotonic()
+    if _rates_snapshot is None or _rates_snapshot_expires_at <= now:
+        db = SessionLocal()
+        try:
+            _rates_snapshot = load_rates_snapshot(db)
+        finally:
+            db.close()
+        _rates_snapshot_expires_at = now + _RATE_CACHE_TTL
+
+    return _rates_snapshot
+
 
 def translate_currency(source_currency_code: str, target_currency_code: str, amount: float) -> float:
     "Translate currency value from source to target currency"
-    db = SessionLocal()
-
-    rate = db.query(CurrencyExchangeRate).filter(
-        CurrencyExchangeRate.source_currency == source_currency_code,
-        CurrencyExchangeRate.target_currency == target_currency_code
-    ).first()
+    rate = get_rates_snapshot().get(
+        source_currency_code, {}).get(target_currency_code)
 
-    if not rate:
+    if rate is None:
         raise ValueError(
             f"Exchange rate from {source_currency_code} to {target_currency_code} not found")
 
-    db.close()
-
-    return rate.rate * amount
+    return rate * amount
@@ -1,21 +1,22 @@
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
-from assets.asset_fetcher import TwelveDataProvider
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from assets.asset_fetcher import get_provider
 from database.database import AsyncSessionLocal
+from database.models import CurrencyExchangeRate
+from currency.translate_currency import invalidate_rate_cache
 
 
 async def update_currencies():
     """Update currency exchange rates in the database (currency_exchange_rates table)"""
     print(f"[{datetime.utcnow()}] Updating currency exchange rates...")
 
-    provider = TwelveDataProvider()
+    provider = get_provider()
 
     try:
         # Fetch currency exchange rates from API
         exchange_rates = await provider.get_currency_exchange_rates()
 
-        print("EXCHANGE RATES:", exchange_rates)
         if not exchange_rates or len(exchange_rates) == 0:
             print("❌ No exchange rates fetched from API.")
             return
@@ -23,38 +24,39 @@ async def update_currencies():
         # Async database operations
         async with AsyncSessionLocal() as db:
             try:
-                # Delete existing exchange rates
-                await db.execute(text("DELETE FROM currency_exchange_rates"))
-
-                # Prepare batch insert
-                valid_rates = []
+                # Prepare batch insert, one row per pair - a single INSERT ... ON CONFLICT
+                # can't update the same row twice
+                rates_by_pair = {}
                 for rate in exchange_rates:
                     # Skip rates without required fields
                     if not rate.get('timestamp') or not rate.get('rate') or not rate.get('symbol'):
                         print(f"❌ Skipping invalid rate data: {rate}")
                         continue
 
-                    valid_rates.append({
-                        "source_currency": rate["symbol"].split("/")[0],
-                        "target_currency": rate["symbol"].split("/")[1],
+                    source_currency, target_currency = rate["symbol"].split("/")[:2]
+                    rates_by_pair[(source_currency, target_currency)] = {
+                        "source_currency": source_currency,
+                        "target_currency": target_currency,
                         "rate": float(rate["rate"]),
                         "fetched_at": datetime.utcfromtimestamp(rate["timestamp"])
-                    })
+                    }
+                valid_rates = list(rates_by_pair.values())
 
-                # Batch insert with unique index (source_currency, target_currency)
+                # Upsert all rates in one multi-row INSERT on the unique index (source_currency,
+                # target_currency) - rows are updated in place, no DELETE of the whole table first
                 if valid_rates:
-                    await db.execute(
-                        text("""
-                            INSERT INTO currency_exchange_rates (source_currency, target_currency, rate, fetched_at)
-                            VALUES (:source_currency, :target_currency, :rate, :fetched_at)
-                            ON CONFLICT (source_currency, target_currency) DO UPDATE SET
-                                rate = EXCLUDED.rate,
-                                fetched_at = EXCLUDED.fetched_at
-                        """),
-                        valid_rates
+                    stmt = pg_insert(CurrencyExchangeRate).values(valid_rates)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=["source_currency", "target_currency"],
+                        set_={
+                            "rate": stmt.excluded.rate,
+                            "fetched_at": stmt.excluded.fetched_at
+                        }
                     )
+                    await db.execute(stmt)
 
                 await db.commit()
+                invalidate_rate_cache()
                 print(
                     f"✅ Successfully updated {len(valid_rates)} currency exchange rates")
 
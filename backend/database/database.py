@@ -1,22 +1,43 @@
 # backend/database/database.py
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert, text
 from sqlalchemy.orm import sessionmaker
 from database.models import Base
 import os
 
-# Sync engine (for existing code)
 print(os.getenv("DATABASE_URL"))
 DATABASE_URL = os.getenv(
     "DATABASE_URL", "postgresql://postgres:postgres@db:5432/mydb")
 
-engine = create_engine(DATABASE_URL)
+# Pool sizing, tunable per deployment. Connections are recycled before idle server/proxy
+# timeouts and pinged on checkout, so a Postgres restart doesn't surface as request errors
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# Sync engine (for existing code)
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Async engine (for async operations)
 ASYNC_DATABASE_URL = DATABASE_URL.replace(
     "postgresql://", "postgresql+asyncpg://")
-async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False)
+# Scheduler jobs and request handlers open several sessions concurrently (per asset type,
+# per fetch batch), so keep a larger warm pool. The async engine uses AsyncAdaptedQueuePool
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True
+)
 AsyncSessionLocal = async_sessionmaker(
     async_engine,
     class_=AsyncSession,
@@ -42,6 +63,55 @@ async def get_async_db():
             await session.close()
 
 
+async def get_driver_connection(db: AsyncSession):
+    """
+    Get the raw asyncpg connection behind an async session (for COPY and other driver-level calls).
+
+    Commands sent on it only join the session's transaction once SQLAlchemy has started one,
+    so execute at least one statement through the session first.
+    """
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    return raw_connection.driver_connection
+
+
+# Indexes added to tables that already exist - create_all only creates missing tables, so
+# these are built at startup. CONCURRENTLY keeps asset_prices writable while it builds
+_ONLINE_INDEXES = {
+    "idx_asset_prices_lookup": (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_asset_prices_lookup "
+        "ON asset_prices (symbol, mic_code, exchange, datetime) "
+        "INCLUDE (interval, open, high, low, close, volume)"
+    ),
+}
+
+_INVALID_INDEX_SQL = text("""
+    SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE c.relname = :name AND NOT i.indisvalid
+""")
+
+
+def ensure_indexes():
+    """
+    Create indexes missing on existing tables (idempotent).
+
+    A build on a large table takes a while, so this is blocking and meant to run in a worker
+    thread next to the app (see main.lifespan). Failures are logged and retried on the next start.
+    """
+    for name, ddl in _ONLINE_INDEXES.items():
+        try:
+            # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                # A failed concurrent build leaves an INVALID index that IF NOT EXISTS would
+                # keep skipping - drop it and build again
+                if conn.execute(_INVALID_INDEX_SQL, {"name": name}).first():
+                    print(f"⚠️ Index {name} is invalid, rebuilding")
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+                conn.execute(text(ddl))
+        except Exception as e:
+            print(f"❌ Error building index {name}: {e}")
+
+
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
@@ -66,13 +136,10 @@ def seed_default_data():
             {"name": "manage_users", "description": "Can manage user roles"},
         ]
 
-        permissions = []
-        for perm_data in permissions_data:
-            perm = Permission(**perm_data)
-            db.add(perm)
-            permissions.append(perm)
-
-        db.flush()  # Get IDs
+        # One multi-row INSERT ... RETURNING gives back persistent Permission objects with IDs
+        permissions = db.scalars(
+            insert(Permission).returning(Permission), permissions_data
+        ).all()
 
         # Create default roles
         admin_role = Role(
@@ -94,9 +161,7 @@ def seed_default_data():
         )
         guest_role.permissions = [p for p in permissions if p.name == "read"]
 
-        db.add(admin_role)
-        db.add(user_role)
-        db.add(guest_role)
+        db.add_all([admin_role, user_role, guest_role])
 
         db.commit()
         print("✅ Default roles and permissions seeded successfully!")
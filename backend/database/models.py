@@ -207,6 +207,13 @@ class AssetPrice(Base):
               'symbol', 'interval', 'datetime'),
         Index('idx_interval_datetime', 'interval',
               'datetime'),  # For cleanup queries
+        # Latest-price-at lookups and price history: (symbol, mic_code, exchange) equality,
+        # datetime range/ORDER BY DESC LIMIT 1, served from the index without heap access.
+        # interval stays out of the key: the price-at and latest-close lookups don't filter on
+        # it, and keying on it would split each asset's rows into two datetime runs.
+        # Existing databases get this index from database.ensure_indexes(), not create_all
+        Index('idx_asset_prices_lookup', 'symbol', 'mic_code', 'exchange', 'datetime',
+              postgresql_include=['interval', 'open', 'high', 'low', 'close', 'volume']),
     )
 
 
@@ -1,22 +1,44 @@
 from fastapi import Header, HTTPException, Depends
 from sqlalchemy.orm import Session
-from jose import jwt, JWTError
+import jwt
+from jwt import InvalidTokenError
+from functools import lru_cache
 import os
+import time
 
 from database.database import get_db
 from database.models import User
 
-APP_SECRET_KEY = os.getenv("APP_SECRET_KEY", "change_me")
+# Single source of the JWT settings - routers.auth signs with the same key it is verified with here
+APP_SECRET_KEY = os.getenv("APP_SECRET_KEY")
 APP_JWT_ALG = os.getenv("APP_JWT_ALG", "HS256")
 
+if not APP_SECRET_KEY:
+    raise RuntimeError("Missing APP_SECRET_KEY in env.")
+
+# Verified tokens remembered so repeated requests with the same token skip the signature check
+_TOKEN_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=_TOKEN_CACHE_SIZE)
+def _decode_access_token(token: str) -> dict:
+    """Verify signature and claims once per token string (invalid tokens raise and are not cached)"""
+    return jwt.decode(token, APP_SECRET_KEY, algorithms=[APP_JWT_ALG])
+
 
 def verify_access_token(token: str):
     try:
-        payload = jwt.decode(token, APP_SECRET_KEY, algorithms=[APP_JWT_ALG])
-        return payload
-    except JWTError:
+        payload = _decode_access_token(token)
+    except InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
+    # A cached payload was verified earlier - expiry still has to be checked on every use
+    exp = payload.get("exp")
+    if exp is not None and exp <= time.time():
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    return payload
+
 
 def get_current_user(authorization: str = Header(None), db: Session = Depends(get_db)):
     """Get current user from JWT token"""
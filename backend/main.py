@@ -5,6 +5,8 @@ load_dotenv()  # noqa
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import asyncio
 import os
 
 from routers.auth import router as auth_router
@@ -13,21 +15,35 @@ from routers.assets import router as assets_router
 from routers.user_settings import router as user_settings_router
 from routers.statistics import router as statistics_router
 from routers.bank_history import router as bank_history_router
-from database.database import init_db, seed_default_data
+from database.database import init_db, seed_default_data, ensure_indexes
 from scheduler.scheduler import initialize_scheduler
+from assets.asset_fetcher import get_provider
 
-app = FastAPI()
 
-
-# Initialize database on startup
-@app.on_event("startup")
-async def startup_event():
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Initialize database on startup
     print("🚀 Initializing database...")
     init_db()
     seed_default_data()
+    # Index builds on existing tables can take minutes - run them in a worker thread so startup
+    # and the event loop don't wait for them
+    index_build = asyncio.create_task(asyncio.to_thread(ensure_indexes))
     await initialize_scheduler()
     print("✅ Database ready!")
 
+    # Open the shared TwelveData client up front; jobs and requests all reuse it
+    get_provider()
+
+    yield
+
+    await get_provider().aclose()
+    if not index_build.done():
+        print("⚠️ Index build still running at shutdown, it will be retried on the next start")
+
+
+app = FastAPI(lifespan=lifespan)
+
 
 # Sessions are required for OAuth (Authlib stores state/nonce in session)
 SESSION_SECRET = os.getenv("SESSION_SECRET", "change_session_secret")
@@ -1,15 +1,18 @@
 # backend/assets/assets.py
 
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 
-from database.database import get_db
+from database.database import get_async_db, get_db
 from database.models import Asset, AssetStatus, AssetType, AssetPrice, CryptoList, Statistic, User
 from routers.auth import get_current_user
-from assets.asset_price_historian import backfill_asset_prices
+from assets.asset_price_historian import backfill_asset_prices, backfill_asset_prices_bulk, invalidate_asset_price_cache
 from assets.asset_price_historian import get_asset_price_history
 from assets.assets_updater import update_user_assets_prices
 from statistics.portfolio_value_updater import update_user_portfolio_value
@@ -80,23 +83,26 @@ class AssetCloseRequest(BaseModel):
 @router.get("/", response_model=List[AssetResponse])
 async def get_my_assets(
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    async_db: AsyncSession = Depends(get_async_db)
 ):
     """Get all assets for current user"""
-    assets = await update_user_assets_prices(user.id)
+    await update_user_assets_prices(user.id)
     await update_user_portfolio_value(user.id, False)
 
-    return assets
+    # Only the response columns; rows come straight from the database, so skip re-validating them
+    result = await async_db.execute(
+        select(*[getattr(Asset, field) for field in AssetResponse.model_fields])
+        .where(
+            Asset.user_id == user.id,
+            Asset.status == AssetStatus.ACTIVE
+        )
+    )
 
+    return [AssetResponse.model_construct(**row._mapping) for row in result]
 
-@router.post("/", response_model=AssetResponse)
-async def create_asset(
-    asset_data: AssetCreate,
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Create a new asset"""
 
+def _new_asset(asset_data: AssetCreate, user: User, db: Session) -> Asset:
+    """Validate asset_data, deduct its cost from savings if requested and build the Asset"""
     # If asset_data.deduct_from_savings is True, deduct amount from user's savings asset
     if asset_data.type != AssetType.SAVINGS and asset_data.deduct_from_savings:
         primary_saving_asset_id = user.settings.primary_saving_asset_id
@@ -145,12 +151,37 @@ async def create_asset(
         user_id=user.id
     )
 
+    return asset
+
+
+def _invalidate_savings_price(user: User) -> None:
+    """Drop the cached value of the user's primary savings asset - call after its balance change is committed"""
+    if user.settings and user.settings.primary_saving_asset_id:
+        invalidate_asset_price_cache(user.settings.primary_saving_asset_id)
+
+
+def _needs_backfill(asset: Asset) -> bool:
+    """Stocks and crypto get historical prices backfilled from their purchase date"""
+    return bool((asset.type == AssetType.STOCKS and asset.symbol and asset.mic_code and asset.purchase_date) or (asset.type == AssetType.CRYPTO and asset.symbol and asset.purchase_date and asset.exchange))
+
+
+@router.post("/", response_model=AssetResponse)
+async def create_asset(
+    asset_data: AssetCreate,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create a new asset"""
+    asset = _new_asset(asset_data, user, db)
+
     db.add(asset)
     db.commit()
+    if asset_data.deduct_from_savings:
+        _invalidate_savings_price(user)
     db.refresh(asset)
 
     # If it's a stock or crypto, backfill historical prices
-    if (asset.type == AssetType.STOCKS and asset.symbol and asset.mic_code and asset.purchase_date) or (asset.type == AssetType.CRYPTO and asset.symbol and asset.purchase_date and asset.exchange):
+    if _needs_backfill(asset):
         try:
             await backfill_asset_prices(asset.symbol, asset.mic_code, asset.exchange, asset.purchase_date)
         except Exception as e:
@@ -164,6 +195,38 @@ async def create_asset(
     return asset
 
 
+@router.post("/bulk", response_model=List[AssetResponse])
+async def create_assets_bulk(
+    assets_data: List[AssetCreate],
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create several assets at once, backfilling their prices with batched requests"""
+    assets = [_new_asset(asset_data, user, db) for asset_data in assets_data]
+
+    db.add_all(assets)
+    db.commit()
+    if any(asset_data.deduct_from_savings for asset_data in assets_data):
+        _invalidate_savings_price(user)
+    for asset in assets:
+        db.refresh(asset)
+
+    backfill = [(asset.symbol, asset.mic_code, asset.exchange, asset.purchase_date)
+                for asset in assets if _needs_backfill(asset)]
+    if backfill:
+        try:
+            await backfill_asset_prices_bulk(backfill)
+        except Exception as e:
+            print(
+                f"⚠️ Warning: Could not backfill prices for {len(backfill)} assets: {e}")
+
+    # Update asset prices and portfolio value once for the whole import
+    await update_user_assets_prices(user.id)
+    await update_user_portfolio_value(user.id)
+
+    return assets
+
+
 @router.put("/{asset_id}", response_model=AssetResponse)
 async def update_asset(
     asset_id: int,
@@ -206,6 +269,7 @@ async def update_asset(
 
     db.commit()
     db.refresh(asset)
+    invalidate_asset_price_cache(asset.id)
 
     await update_user_assets_prices(user.id)
     await update_user_portfolio_value(user.id)
@@ -230,6 +294,7 @@ async def delete_asset(
 
     db.delete(asset)
     db.commit()
+    invalidate_asset_price_cache(asset_id)
 
     await update_user_assets_prices(user.id)
     await update_user_portfolio_value(user.id)
@@ -295,6 +360,8 @@ async def close_asset(
 
     asset.status = AssetStatus.CLOSED
     db.commit()
+    if request.transfer_to_savings:
+        _invalidate_savings_price(user)
 
     await update_user_assets_prices(user.id)
     await update_user_portfolio_value(user.id)
@@ -366,7 +433,7 @@ async def search_crypto_by_symbol(
     }
 
 
-@router.get("/prices/{symbol}/{mic_code}")
+@router.get("/prices/{symbol}/{mic_code}", response_class=ORJSONResponse)
 async def get_asset_price_time_series(
     symbol: str,
     mic_code: str,  # ← Use MIC code
@@ -385,13 +452,14 @@ async def get_asset_price_time_series(
 
     try:
         history = await get_asset_price_history(symbol, mic_code, exchange, start_date, end_date)
-        return {
+        # Serialized straight by orjson, skipping FastAPI's jsonable_encoder pass over every row
+        return ORJSONResponse({
             "symbol": symbol,
             "mic_code": mic_code,
             "start_date": start_date.isoformat(),
             "end_date": end_date.isoformat(),
             "data": history
-        }
+        })
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error fetching price history: {str(e)}")
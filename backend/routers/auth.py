@@ -2,7 +2,7 @@
 from fastapi import APIRouter, Request, HTTPException, Depends, Header
 from fastapi.responses import RedirectResponse
 from authlib.integrations.starlette_client import OAuth, OAuthError
-from jose import jwt, JWTError
+import jwt
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 from typing import List
@@ -12,15 +12,13 @@ import os
 from database.database import get_db
 from database.models import User, Role, UserSetting
 from routers.user_settings import UserSettingsResponse
-from dependencies.auth_dependencies import get_current_user
+from dependencies.auth_dependencies import APP_JWT_ALG, APP_SECRET_KEY, get_current_user
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 # -----------------------
 # ENV / CONFIG
 # -----------------------
-APP_SECRET_KEY = os.getenv("APP_SECRET_KEY", "change_me")
-APP_JWT_ALG = os.getenv("APP_JWT_ALG", "HS256")
 APP_JWT_EXPIRE_MIN = int(os.getenv("APP_JWT_EXPIRE_MIN", "60"))
 
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
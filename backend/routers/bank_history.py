@@ -13,6 +13,7 @@ from database.database import get_db
 from database.models import BankHistory, User, Asset, AssetType
 from dependencies.auth_dependencies import get_current_user
 from csv_parser import CSVParser
+from assets.asset_price_historian import invalidate_asset_price_cache
 from statistics.portfolio_value_updater import update_user_portfolio_value
 
 router = APIRouter(prefix="/bank_history", tags=["bank_history"])
@@ -110,7 +111,7 @@ async def upload_bank_csv(
     parser = CSVParser()
 
     try:
-        parsed_data = parser.parse_csv(csv_text, asset_id)
+        parsed_data = await parser.parse_csv(csv_text, asset_id)
     except ValueError as e:
         raise HTTPException(
             status_code=400,
@@ -176,6 +177,8 @@ async def upload_bank_csv(
         # Update linked savings asset's current balance
         savings_asset.purchase_price = bank_history.final_balance
         db.commit()
+        # SAVINGS value is purchase_price - drop the cached one before revaluing the portfolio
+        invalidate_asset_price_cache(savings_asset.id)
         db.refresh(savings_asset)
         await update_user_portfolio_value(savings_asset.user_id, False)
 
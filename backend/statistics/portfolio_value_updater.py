@@ -6,18 +6,18 @@ import os
 # load_dotenv()  # noqa
 
 from fastapi import Depends
-import requests
 import asyncio
 from datetime import datetime
 import httpx
 from sqlalchemy.orm import Session
 from typing import List, Dict
-from sqlalchemy import Date, cast, select, text
+from sqlalchemy import Date, cast, func, select, text
 
 from assets.asset_price_historian import get_asset_price_at_datetime
+from assets.bonds.update_bonds_prices import calculate_bond_values
 from currency.translate_currency import translate_currency
 from database.database import AsyncSessionLocal
-from database.models import Asset, Statistic
+from database.models import Asset, AssetType, Statistic
 
 
 async def update_portfolio_values() -> None:
@@ -38,6 +38,51 @@ async def update_portfolio_values() -> None:
     print("Portfolio values updated.")
 
 
+async def _bond_values_at(async_db, user_id: int, dates: List[datetime]) -> Dict[int, Dict[datetime, float]]:
+    """
+    Value the user's active bonds at all given dates with one accrual walk per bond.
+
+    Mirrors get_asset_price_at_datetime (accrual up to each date); bonds whose settings
+    can't be valued are left out so the caller falls back to it.
+    """
+    result = await async_db.execute(
+        select(Asset).where(
+            Asset.user_id == user_id,
+            Asset.status == 'ACTIVE',
+            Asset.type == AssetType.BONDS
+        )
+    )
+
+    values = {}
+    for bond in result.scalars().all():
+        bond_dates = [date for date in dates
+                      if bond.purchase_date and date >= bond.purchase_date]
+        if not bond_dates:
+            continue
+
+        bond_settings = bond.bond_settings or {}
+        try:
+            bond_values = calculate_bond_values(
+                purchase_price=bond.purchase_price,
+                capitalization_of_interest=bond_settings.get(
+                    "capitalizationOfInterest", False),
+                capitalization_frequency=bond_settings.get(
+                    "capitalizationFrequency", None),
+                interestRateResetsFrequency=bond_settings.get(
+                    "interestRateResetsFrequency", 12),
+                purchase_date=bond.purchase_date.isoformat(),
+                maturity_date=max(bond_dates).isoformat(),
+                interest_rates=bond_settings.get("interestRates", None),
+                target_dates=bond_dates
+            )
+        except ValueError:
+            continue
+
+        values[bond.id] = dict(zip(bond_dates, bond_values))
+
+    return values
+
+
 async def update_user_portfolio_value(user_id: int, backwards: bool = True) -> None:
     """Update portfolio value statistics for the user, going backwards in time"""
     # Now add statistic based on asset purchase date (and all other assets that were purchased at or before that date)
@@ -123,6 +168,9 @@ async def update_user_portfolio_value(user_id: int, backwards: bool = True) -> N
         #  2. Update existing statistics
         # ---------------------------------------------------------------------------------------
         if relevant_statistics and backwards:
+            bond_values = await _bond_values_at(
+                async_db, user_id, [statistic.date for statistic in relevant_statistics])
+
             for statistic in relevant_statistics:
                 result = await async_db.execute(
                     select(Asset)
@@ -138,10 +186,11 @@ async def update_user_portfolio_value(user_id: int, backwards: bool = True) -> N
                 portfolio_distribution = {}
 
                 for asset in assets:
-                    asset_price = await get_asset_price_at_datetime(
-                        asset.id, statistic.date) or asset.purchase_price
-
-                    print(statistic.date, " vs datetime now ", datetime.utcnow())
+                    if statistic.date in bond_values.get(asset.id, {}):
+                        asset_price = bond_values[asset.id][statistic.date] or asset.purchase_price
+                    else:
+                        asset_price = await get_asset_price_at_datetime(
+                            asset.id, statistic.date) or asset.purchase_price
 
                     if asset.currency and asset.currency != "USD":
                         total_value += translate_currency(
@@ -162,30 +211,34 @@ async def update_user_portfolio_value(user_id: int, backwards: bool = True) -> N
         # ---------------------------------------------------------------------------------------
         # 3. Add statistic new statistic for today if needed
         # --------------------------------------------------------------------------------------
+        # Sum values per (type, currency) in PostgreSQL - only a handful of rows come back
+        # and each group needs a single currency translation
         result = await async_db.execute(
-            select(Asset).where(
+            select(
+                Asset.type,
+                Asset.currency,
+                func.sum(func.coalesce(Asset.current_price,
+                         Asset.purchase_price) * Asset.quantity)
+            )
+            .where(
                 Asset.user_id == user_id,
                 Asset.status == 'ACTIVE'
             )
+            .group_by(Asset.type, Asset.currency)
         )
-        assets = result.scalars().all()
 
         total_value = 0.0
         portfolio_distribution = {}
 
-        for asset in assets:
-            asset_price = asset.current_price if asset.current_price is not None else asset.purchase_price
+        for asset_type, currency, value in result.all():
+            value = value or 0.0
 
-            if asset.currency and asset.currency != "USD":
-                total_value += translate_currency(
-                    asset.currency, "USD", asset_price * asset.quantity)
-                portfolio_distribution[asset.type] = portfolio_distribution.get(asset.type, 0) + translate_currency(
-                    asset.currency, "USD", asset_price * asset.quantity)
+            if currency and currency != "USD":
+                value = translate_currency(currency, "USD", value)
 
-            else:
-                total_value += asset_price * asset.quantity
-                portfolio_distribution[asset.type] = portfolio_distribution.get(
-                    asset.type, 0) + (asset_price * asset.quantity)
+            total_value += value
+            portfolio_distribution[asset_type] = portfolio_distribution.get(
+                asset_type, 0) + value
 
         last_statistic = await async_db.execute(
             select(Statistic)